@@ -167,9 +167,26 @@ def json_upload_form() -> rx.Component:
                             filename,
                             class_name="ml-2 text-sm font-medium text-gray-700",
                         ),
+                        rx.el.button(
+                            rx.icon("x", size=14),
+                            on_click=State.remove_uploaded_file(
+                                filename
+                            ).stop_propagation,
+                            title="Remove file",
+                            class_name="ml-2 text-gray-400 hover:text-red-500",
+                        ),
                         class_name="mt-2 flex items-center bg-gray-100 px-3 py-1.5 rounded-md",
                     ),
                 ),
+                rx.cond(
+                    State.uploaded_files.length() > 1,
+                    rx.el.button(
+                        "Clear all",
+                        on_click=State.clear_uploads.stop_propagation,
+                        class_name="mt-2 text-sm font-medium text-gray-500 hover:text-red-500",
+                    ),
+                    None,
+                ),
                 class_name="text-center",
             ),
             class_name="flex flex-col items-center justify-center w-full h-64 p-6 border-2 border-dashed border-gray-300 rounded-xl cursor-pointer hover:bg-gray-50 transition-colors duration-200",
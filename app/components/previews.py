@@ -1,5 +1,6 @@
 import reflex as rx
 from app.states.state import State
+from app.components.forms import _input_field
 
 
 def _table_selector() -> rx.Component:
@@ -39,6 +40,81 @@ def _collection_selector() -> rx.Component:
     )
 
 
+def _output_mode_options() -> rx.Component:
+    """Lets the user choose between plain inserts and a keyed merge/upsert."""
+    nosql_target = (State.active_tab == "sql_to_nosql") | (
+        State.active_tab == "json_to_nosql"
+    )
+    return rx.el.div(
+        rx.el.div(
+            rx.el.label(
+                "Output Mode",
+                class_name="block text-sm font-medium text-gray-700 mb-1.5",
+            ),
+            rx.el.select(
+                rx.el.option("Insert (new target)", value="insert"),
+                rx.el.option("Merge / Upsert on key", value="merge"),
+                on_change=State.set_output_mode,
+                value=State.output_mode,
+                class_name="w-full px-3 py-2 bg-white border border-gray-300 rounded-lg shadow-sm focus:outline-none focus:ring-2 focus:ring-indigo-500 focus:border-indigo-500 transition-all duration-200",
+            ),
+            class_name="w-full",
+        ),
+        rx.cond(
+            State.output_mode == "merge",
+            rx.el.div(
+                _input_field(
+                    "Merge Key", "e.g., id", State.merge_key, State.set_merge_key
+                ),
+                rx.cond(
+                    nosql_target,
+                    rx.el.div(
+                        rx.checkbox(
+                            "Also upsert into a MongoDB target",
+                            checked=State.upsert_to_mongo,
+                            on_change=State.set_upsert_to_mongo,
+                            class_name="text-sm font-medium text-gray-700",
+                        ),
+                        rx.cond(
+                            State.upsert_to_mongo,
+                            rx.el.div(
+                                rx.el.div(
+                                    _input_field(
+                                        "Target Connection String",
+                                        "mongodb://...",
+                                        State.target_mongo_conn_string,
+                                        State.set_target_mongo_conn_string,
+                                    ),
+                                    class_name="md:col-span-2",
+                                ),
+                                _input_field(
+                                    "Target Database",
+                                    "e.g., my_app_db",
+                                    State.target_mongo_database,
+                                    State.set_target_mongo_database,
+                                ),
+                                _input_field(
+                                    "Target Collection",
+                                    "e.g., users",
+                                    State.target_mongo_collection,
+                                    State.set_target_mongo_collection,
+                                ),
+                                class_name="grid grid-cols-1 md:grid-cols-2 gap-x-6 gap-y-4",
+                            ),
+                            None,
+                        ),
+                        class_name="space-y-4",
+                    ),
+                    None,
+                ),
+                class_name="space-y-4",
+            ),
+            None,
+        ),
+        class_name="space-y-4 mb-4",
+    )
+
+
 def _conversion_controls_section() -> rx.Component:
     """Section with conversion and download buttons."""
     return rx.el.div(
@@ -51,16 +127,26 @@ def _conversion_controls_section() -> rx.Component:
                 "Your data is ready for conversion.",
                 class_name="text-sm text-gray-500 mb-4",
             ),
+            _output_mode_options(),
             rx.cond(
                 State.download_ready,
-                rx.el.button(
-                    rx.icon("cloud_download", class_name="mr-2"),
-                    "Download ",
-                    rx.el.span(
-                        State.download_filename, class_name="font-semibold ml-1"
+                rx.el.div(
+                    rx.el.button(
+                        rx.icon("cloud_download", class_name="mr-2"),
+                        "Download ",
+                        rx.el.span(
+                            State.download_filename, class_name="font-semibold ml-1"
+                        ),
+                        on_click=State.download_converted_file,
+                        class_name="w-full flex items-center justify-center px-4 py-2.5 text-sm font-semibold text-white bg-green-600 rounded-lg shadow-md hover:bg-green-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-green-500 transition-all duration-200",
                     ),
-                    on_click=State.download_converted_file,
-                    class_name="w-full flex items-center justify-center px-4 py-2.5 text-sm font-semibold text-white bg-green-600 rounded-lg shadow-md hover:bg-green-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-green-500 transition-all duration-200",
+                    rx.el.button(
+                        rx.icon("shield-check", class_name="mr-2"),
+                        "Download Checksum Manifest",
+                        on_click=State.download_checksum_manifest,
+                        class_name="w-full flex items-center justify-center px-4 py-2.5 text-sm font-medium text-gray-700 bg-white border border-gray-300 rounded-lg shadow-sm hover:bg-gray-50 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 transition-all duration-200",
+                    ),
+                    class_name="space-y-3",
                 ),
                 rx.el.button(
                     rx.icon("wand-sparkles", class_name="mr-2"),
@@ -106,5 +192,16 @@ def data_preview_section() -> rx.Component:
             ),
             None,
         ),
-        rx.cond(State.preview_data.length() > 0, _conversion_controls_section(), None),
-    )
\ No newline at end of file
+        rx.cond(
+            (State.preview_data.length() > 0)
+            | (
+                (
+                    (State.active_tab == "json_to_sql")
+                    | (State.active_tab == "json_to_nosql")
+                )
+                & (State.uploaded_files.length() > 0)
+            ),
+            _conversion_controls_section(),
+            None,
+        ),
+    )
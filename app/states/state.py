@@ -1,19 +1,31 @@
 import reflex as rx
+import asyncio
+import contextlib
 import logging
+import os
+import uuid
 from typing import Literal
-from bson import ObjectId
+from app.utils.checksums import TableDigest, manifest_json
+from app.utils.dedup import prepare_rows
+from app.utils.converters import (
+    _convert_mongo_types,
+    iter_mongo_documents,
+    iter_upserted,
+    iter_sql_rows,
+    normalize_sql_row,
+    project_to_first_columns,
+    write_json_array,
+    write_sql_script,
+)
+from app.utils.parallel_json import (
+    convert_json_files_to_json,
+    convert_json_files_to_sql,
+)
 
 ConversionType = Literal["sql_to_nosql", "nosql_to_sql", "json_to_sql", "json_to_nosql"]
-
-
-def _convert_mongo_types(doc):
-    if isinstance(doc, dict):
-        return {key: _convert_mongo_types(value) for key, value in doc.items()}
-    elif isinstance(doc, list):
-        return [_convert_mongo_types(item) for item in doc]
-    elif isinstance(doc, ObjectId):
-        return str(doc)
-    return doc
+OutputMode = Literal["insert", "merge"]
+# Converted files are written here, inside the upload dir, and served by URL.
+DOWNLOAD_DIR = "downloads"
 
 
 class State(rx.State):
@@ -31,7 +43,10 @@ class State(rx.State):
     selected_collection: str = ""
     download_ready: bool = False
     download_filename: str = ""
-    download_content: str = ""
+    _download_name: str = ""
+    _download_manifest: str = ""
+    output_mode: OutputMode = "insert"
+    merge_key: str = ""
     sql_host: str = "localhost"
     sql_port: int = 3306
     sql_user: str = ""
@@ -40,11 +55,20 @@ class State(rx.State):
     mongo_conn_string: str = ""
     mongo_database: str = ""
     mongo_collection: str = ""
+    upsert_to_mongo: bool = False
+    target_mongo_conn_string: str = ""
+    target_mongo_database: str = ""
+    target_mongo_collection: str = ""
 
     def _reset_download_state(self):
         self.download_ready = False
         self.download_filename = ""
-        self.download_content = ""
+        if self._download_name:
+            (rx.get_upload_dir() / DOWNLOAD_DIR / self._download_name).unlink(
+                missing_ok=True
+            )
+        self._download_name = ""
+        self._download_manifest = ""
 
     def _reset_preview(self):
         self.preview_data = []
@@ -57,8 +81,27 @@ class State(rx.State):
         self.connection_status = ""
         self.sql_tables = []
         self.mongo_collections = []
+        self.upsert_to_mongo = False
         self._reset_preview()
 
+    @rx.event
+    def set_upsert_to_mongo(self, enabled: bool):
+        """Turns upserting into the target MongoDB collection on or off."""
+        self.upsert_to_mongo = enabled
+        self._reset_download_state()
+
+    @rx.event
+    def set_output_mode(self, mode: OutputMode):
+        """Switches between plain inserts and keyed merge/upsert output."""
+        self.output_mode = mode
+        self._reset_download_state()
+
+    @rx.event
+    def set_merge_key(self, key: str):
+        """Sets the field that merge mode deduplicates and upserts on."""
+        self.merge_key = key
+        self._reset_download_state()
+
     @rx.event
     async def handle_upload(self, files: list[rx.UploadFile]):
         """Handles the JSON file upload."""
@@ -72,9 +115,22 @@ class State(rx.State):
             with file_path.open("wb") as f:
                 f.write(upload_data)
             self.uploaded_files.append(file.filename)
+        self._reset_download_state()
         self.is_uploading = False
         return
 
+    @rx.event
+    def remove_uploaded_file(self, filename: str):
+        """Drops one uploaded file from the next conversion."""
+        self.uploaded_files = [name for name in self.uploaded_files if name != filename]
+        self._reset_download_state()
+
+    @rx.event
+    def clear_uploads(self):
+        """Drops every uploaded file from the next conversion."""
+        self.uploaded_files = []
+        self._reset_download_state()
+
     @rx.event(background=True)
     async def test_sql_connection(self):
         """Tests the SQL database connection and fetches table names."""
@@ -139,9 +195,7 @@ class State(rx.State):
             cursor.close()
             conn.close()
             for row in data:
-                for key, value in row.items():
-                    if hasattr(value, "isoformat"):
-                        row[key] = value.isoformat()
+                normalize_sql_row(row)
             async with self:
                 self.preview_data = data
         except Exception as e:
@@ -183,14 +237,20 @@ class State(rx.State):
         if not converter:
             yield rx.toast.error("Invalid conversion type.")
             return
+        download_dir = rx.get_upload_dir() / DOWNLOAD_DIR
+        download_dir.mkdir(parents=True, exist_ok=True)
+        name = uuid.uuid4().hex
         try:
-            filename, content = await converter()
+            with open(download_dir / name, "w") as out:
+                filename, digests = await converter(out)
             async with self:
                 self.download_filename = filename
-                self.download_content = content
+                self._download_name = name
+                self._download_manifest = manifest_json(digests)
                 self.download_ready = True
             yield rx.toast.success("Conversion successful! Your download is ready.")
         except Exception as e:
+            (download_dir / name).unlink(missing_ok=True)
             logging.exception(f"Conversion failed: {e}")
             yield rx.toast.error(f"Conversion Error: {e}")
 
@@ -206,85 +266,148 @@ class State(rx.State):
             return self._convert_json_to_nosql
         return None
 
-    async def _convert_sql_to_nosql(self):
-        """Converts SQL table data to a JSON string for NoSQL."""
-        import json
+    def _sql_connect(self):
+        import mysql.connector
+
+        return mysql.connector.connect(
+            host=self.sql_host,
+            port=self.sql_port,
+            user=self.sql_user,
+            password=self.sql_password,
+            database=self.sql_database,
+        )
+
+    def _merge_key(self) -> str | None:
+        """Returns the merge key in merge mode, or None for plain inserts."""
+        if self.output_mode != "merge":
+            return None
+        key = self.merge_key.strip()
+        if not key:
+            raise ValueError("Enter the key column/field to merge on.")
+        return key
+
+    def _prepare_rows(self, rows, digest: TableDigest):
+        """Keeps the last row per key in merge mode and feeds the rows into the digest."""
+        return prepare_rows(rows, digest, self._merge_key())
+
+    def _mongo_target(self) -> tuple[str, str] | None:
+        """Returns the target connection string and database to upsert into.
+
+        Only set in merge mode with the upsert toggle on; the source
+        connection fields are never used as a target.
+        """
+        if self._merge_key() is None or not self.upsert_to_mongo:
+            return None
+        if not self.target_mongo_conn_string or not self.target_mongo_database:
+            raise ValueError("Enter the target MongoDB connection string and database.")
+        return (self.target_mongo_conn_string, self.target_mongo_database)
 
-        return (f"{self.selected_table}.json", json.dumps(self.preview_data, indent=2))
+    @contextlib.contextmanager
+    def _mongo_upserts(self, rows, default_collection: str):
+        """Upserts rows into the target MongoDB collection when enabled.
 
-    async def _convert_nosql_to_sql(self):
+        Otherwise the rows are passed through untouched.
+        """
+        target = self._mongo_target()
+        if target is None:
+            yield rows
+            return
+        import pymongo
+
+        conn_string, database = target
+        client = pymongo.MongoClient(conn_string)
+        try:
+            coll = client[database][self.target_mongo_collection or default_collection]
+            yield iter_upserted(coll, rows, self._merge_key())
+        finally:
+            client.close()
+
+    def _write_sql_to_nosql(self, out) -> TableDigest:
+        conn = self._sql_connect()
+        digest = TableDigest(self.selected_table, self._merge_key())
+        try:
+            rows = self._prepare_rows(iter_sql_rows(conn, self.selected_table), digest)
+            with self._mongo_upserts(rows, self.selected_table) as rows:
+                write_json_array(rows, out)
+        finally:
+            conn.close()
+        return digest
+
+    async def _convert_sql_to_nosql(self, out):
+        """Converts SQL table data to a JSON array for NoSQL."""
+        digest = await asyncio.to_thread(self._write_sql_to_nosql, out)
+        return (f"{self.selected_table}.json", [digest])
+
+    def _write_nosql_to_sql(self, out) -> TableDigest:
+        import pymongo
+
+        client = pymongo.MongoClient(self.mongo_conn_string)
+        digest = TableDigest(self.selected_collection, self._merge_key())
+        try:
+            coll = client[self.mongo_database][self.selected_collection]
+            documents = self._prepare_rows(
+                project_to_first_columns(iter_mongo_documents(coll)), digest
+            )
+            write_sql_script(
+                self.selected_collection, documents, out, self._merge_key()
+            )
+        finally:
+            client.close()
+        return digest
+
+    async def _convert_nosql_to_sql(self, out):
         """Converts MongoDB collection data to SQL INSERT statements."""
-        if not self.preview_data:
-            return (f"{self.selected_collection}.sql", "-- No data to convert.")
-        table_name = self.selected_collection
-        columns = list(self.preview_data[0].keys())
-        create_statement = f"CREATE TABLE `{table_name}` (\n"
-        for col in columns:
-            sample_val = self.preview_data[0][col]
-            sql_type = "VARCHAR(255)"
-            if isinstance(sample_val, int):
-                sql_type = "INT"
-            elif isinstance(sample_val, float):
-                sql_type = "FLOAT"
-            elif isinstance(sample_val, bool):
-                sql_type = "BOOLEAN"
-            elif col == "_id":
-                sql_type = "VARCHAR(24)"
-            create_statement += f"  `{col}` {sql_type},\n"
-        create_statement = (
-            create_statement.rstrip(""",
-""")
-            + """
-);
-
-"""
-        )
-        insert_statements = ""
-        for row in self.preview_data:
-            values = []
-            for col in columns:
-                val = row.get(col)
-                if val is None:
-                    values.append("NULL")
-                elif isinstance(val, bool):
-                    values.append(str(val).upper())
-                elif isinstance(val, (int, float)):
-                    values.append(val)
-                else:
-                    values.append(f"""'{str(val).replace("'", "''")}'""")
-            insert_statements += f"INSERT INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES ({', '.join(map(str, values))});\n"
-        return (f"{table_name}.sql", create_statement + insert_statements)
-
-    async def _convert_json_to_sql(self):
-        """Converts uploaded JSON to SQL."""
-        if not self.uploaded_files:
-            raise ValueError("No JSON file uploaded.")
-        import json
-        import os
-
-        filename = self.uploaded_files[-1]
-        self.selected_collection = os.path.splitext(filename)[0]
-        filepath = rx.get_upload_dir() / filename
-        with open(filepath, "r") as f:
-            data = json.load(f)
-        self.preview_data = data if isinstance(data, list) else [data]
-        return await self._convert_nosql_to_sql()
-
-    async def _convert_json_to_nosql(self):
-        """Converts uploaded JSON to a formatted JSON string."""
+        digest = await asyncio.to_thread(self._write_nosql_to_sql, out)
+        return (f"{self.selected_collection}.sql", [digest])
+
+    def _uploaded_paths(self) -> list:
         if not self.uploaded_files:
             raise ValueError("No JSON file uploaded.")
-        import json
+        upload_dir = rx.get_upload_dir()
+        return [upload_dir / name for name in dict.fromkeys(self.uploaded_files)]
 
-        filepath = rx.get_upload_dir() / self.uploaded_files[-1]
-        with open(filepath, "r") as f:
-            data = json.load(f)
-        return (f"{self.uploaded_files[-1]}", json.dumps(data, indent=2))
+    async def _convert_json_to_sql(self, out):
+        """Converts every uploaded JSON file to a table of one SQL script."""
+        paths = self._uploaded_paths()
+        digests = await asyncio.to_thread(
+            convert_json_files_to_sql, paths, out, self._merge_key()
+        )
+        if len(paths) == 1:
+            filename = f"{os.path.splitext(paths[0].name)[0]}.sql"
+        else:
+            filename = "uploaded_tables.sql"
+        return (filename, digests)
+
+    async def _convert_json_to_nosql(self, out):
+        """Converts every uploaded JSON file into one formatted JSON array."""
+        paths = self._uploaded_paths()
+        collection = self.target_mongo_collection or os.path.splitext(paths[0].name)[0]
+        digest = await asyncio.to_thread(
+            convert_json_files_to_json,
+            paths,
+            out,
+            collection,
+            self._merge_key(),
+            self._mongo_target(),
+        )
+        filename = paths[0].name if len(paths) == 1 else "uploaded_documents.json"
+        return (filename, [digest])
 
     @rx.event
     def download_converted_file(self):
         """Serves the converted file for download."""
-        return rx.download(data=self.download_content, filename=self.download_filename)
+        return rx.download(
+            url=rx.get_upload_url(f"{DOWNLOAD_DIR}/{self._download_name}"),
+            filename=self.download_filename,
+        )
+
+    @rx.event
+    def download_checksum_manifest(self):
+        """Serves the source checksums of the last conversion for later verification."""
+        stem = os.path.splitext(self.download_filename)[0]
+        return rx.download(
+            data=self._download_manifest, filename=f"{stem}.checksums.json"
+        )
 
     @rx.event(background=True)
     async def test_mongo_connection(self):
@@ -316,4 +439,4 @@ class State(rx.State):
             yield rx.toast.error(f"Mongo Error: {e}")
         finally:
             async with self:
-                self.is_connecting = False
\ No newline at end of file
+                self.is_connecting = False
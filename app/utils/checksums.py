@@ -0,0 +1,270 @@
+import hashlib
+import heapq
+import json
+import math
+import zlib
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+HASH_BUCKETS = 256
+# Keys kept (lowest hashes first) to place the verifier's scan partitions.
+SAMPLE_SIZE = 4096
+PARTITIONS = 64
+# Bump whenever hashing changes; digests of different versions never match.
+MANIFEST_VERSION = 1
+VALUE_COLUMN = "_value"
+_MASK = (1 << 64) - 1
+# Same output as json.dumps(value, default=str), without building an encoder per call.
+_JSON_ENCODER = json.JSONEncoder(default=str)
+
+
+def _canonical(value) -> str:
+    """Renders a value identically on both sides of a conversion."""
+    kind = type(value)
+    if kind is str:
+        return value
+    if kind is int:
+        return str(value)
+    if kind is float:
+        # repr already is the canonical text unless it uses an exponent
+        # (or is inf/nan); "1.0" style integral values drop the fraction.
+        text = repr(value)
+        if "e" not in text and "n" not in text:
+            return str(int(value)) if text.endswith(".0") else text
+    if value is None:
+        return "\x00"
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (float, Decimal)):
+        if not math.isfinite(value):
+            return str(float(value))
+        if value == int(value):
+            return str(int(value))
+        # Floats and DECIMALs share one full-precision fixed-point rendering.
+        if isinstance(value, float):
+            value = Decimal(repr(value))
+        return format(value.normalize(), "f")
+    if isinstance(value, (dict, list)):
+        return _JSON_ENCODER.encode(value)
+    return str(value)
+
+
+def _hash(text: str) -> int:
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class TableDigest:
+    """Order-independent checksums and row counts for one table or collection.
+
+    Every non-null field of a row is hashed, so records with differing
+    fields are fully covered; a missing field and a null one are the same,
+    as they are once written to a SQL table. Pass `columns` to hash only
+    those columns, e.g. the ones a SQL script actually writes.
+
+    Each row hashes once, from its sorted fields, to a 64-bit value. Each
+    cell also adds a cheap CRC scaled by a per-row key factor to its
+    column's checksum, so values swapped between rows are caught. All sums
+    are modulo 2**64, so rows can be added in any order and digests of
+    disjoint parts can be merged.
+
+    Rows are also counted and summed per hash bucket of their key, which
+    keeps the manifest a fixed size whatever the key distribution. A
+    bottom-k sample of integer or string keys gives quantile bounds the
+    verifier uses to split its scan of the target.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        key: str | None = None,
+        columns: list[str] | None = None,
+    ):
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.row_count = 0
+        self.checksum = 0
+        self.column_checksums: dict[str, int] = {}
+        self.buckets: dict[int, list[int]] = {}
+        # "int" or "str" while every key has that type, then "mixed".
+        self.key_type: str | None = None
+        self._sample: list[tuple[int, object]] = []
+        self._bounds: list | None = None
+
+    def add(self, row) -> None:
+        if isinstance(row, dict):
+            if self.key is None:
+                self.key = next(iter(self.columns or row), None)
+            key = row.get(self.key)
+            if self.columns is None:
+                cells = row.items()
+            else:
+                cells = [(col, row.get(col)) for col in self.columns]
+        else:
+            # JSON arrays may hold scalars or lists; hash them as one value column.
+            key = row
+            cells = ((VALUE_COLUMN, row),)
+        key_hash = _hash(_canonical(key))
+        factor = key_hash | 1
+        column_checksums = self.column_checksums
+        fields = []
+        for col, value in cells:
+            if value is None:
+                continue
+            text = _canonical(value)
+            fields.append(f"{col}\x1f{text}")
+            column_checksums[col] = (
+                column_checksums.get(col, 0) + (zlib.crc32(text.encode()) + 1) * factor
+            ) & _MASK
+        fields.sort()
+        row_hash = _hash("\x1e".join(fields))
+        self.row_count += 1
+        self.checksum = (self.checksum + row_hash) & _MASK
+        stats = self.buckets.setdefault(key_hash % HASH_BUCKETS, [0, 0])
+        stats[0] += 1
+        stats[1] = (stats[1] + row_hash) & _MASK
+        kind = type(key)
+        self._note_key_type("int" if kind is int else "str" if kind is str else "mixed")
+        if self.key_type != "mixed":
+            self._sample_key(-key_hash, key)
+
+    def _note_key_type(self, kind: str | None) -> None:
+        if kind is None or kind == self.key_type:
+            return
+        self.key_type = kind if self.key_type is None else "mixed"
+        if self.key_type == "mixed":
+            self._sample = []
+
+    def _sample_key(self, priority: int, key) -> None:
+        sample = self._sample
+        if len(sample) < SAMPLE_SIZE:
+            heapq.heappush(sample, (priority, key))
+        elif priority > sample[0][0]:
+            heapq.heapreplace(sample, (priority, key))
+
+    def track(self, rows: Iterable) -> Iterator:
+        """Passes rows through unchanged while adding them to the digest."""
+        for row in rows:
+            self.add(row)
+            yield row
+
+    def merge(self, other: "TableDigest") -> None:
+        self.row_count += other.row_count
+        self.checksum = (self.checksum + other.checksum) & _MASK
+        for col, value in other.column_checksums.items():
+            self.column_checksums[col] = (
+                self.column_checksums.get(col, 0) + value
+            ) & _MASK
+        for bucket, (count, checksum) in other.buckets.items():
+            stats = self.buckets.setdefault(bucket, [0, 0])
+            stats[0] += count
+            stats[1] = (stats[1] + checksum) & _MASK
+        self._note_key_type(other.key_type)
+        if self.key_type != "mixed":
+            for priority, key in other._sample:
+                self._sample_key(priority, key)
+
+    def key_bounds(self) -> list:
+        """Returns up to PARTITIONS - 1 sorted keys that split the key space.
+
+        Empty when keys are not all integers or all strings, since those
+        cannot be range-queried consistently.
+        """
+        if self._bounds is not None:
+            return self._bounds
+        if self.key_type not in ("int", "str"):
+            return []
+        keys = sorted({key for _, key in self._sample})
+        return sorted(
+            {keys[len(keys) * i // PARTITIONS] for i in range(1, PARTITIONS)}
+            if len(keys) >= PARTITIONS
+            else keys[1:]
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "table": self.table,
+            "key": self.key,
+            "columns": self.hashed_columns(),
+            "row_count": self.row_count,
+            "checksum": f"{self.checksum:016x}",
+            "column_checksums": {
+                col: f"{value:016x}" for col, value in self.column_checksums.items()
+            },
+            "key_bounds": self.key_bounds(),
+            "buckets": {
+                str(bucket): {"rows": count, "checksum": f"{checksum:016x}"}
+                for bucket, (count, checksum) in sorted(self.buckets.items())
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TableDigest":
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported checksum manifest version: {data.get('version')!r}."
+            )
+        digest = cls(data["table"], data["key"], data["columns"])
+        digest.row_count = data["row_count"]
+        digest.checksum = int(data["checksum"], 16)
+        digest.column_checksums = {
+            col: int(value, 16) for col, value in data["column_checksums"].items()
+        }
+        digest.buckets = {
+            int(bucket): [stats["rows"], int(stats["checksum"], 16)]
+            for bucket, stats in data["buckets"].items()
+        }
+        digest._bounds = data["key_bounds"]
+        return digest
+
+    def hashed_columns(self) -> list[str]:
+        """Returns the fixed columns, or every column seen so far, sorted."""
+        if self.columns is not None:
+            return list(self.columns)
+        return sorted(self.column_checksums)
+
+    def empty_like(self) -> "TableDigest":
+        """Returns an empty digest with the same table and key.
+
+        It hashes only the columns this digest has covered, so fields a
+        target adds on its own (such as MongoDB's `_id`) are ignored.
+        """
+        return TableDigest(self.table, self.key, self.hashed_columns())
+
+
+def manifest_json(digests: list[TableDigest]) -> str:
+    """Serializes one digest as an object, or several as a list of objects."""
+    if len(digests) == 1:
+        return digests[0].to_json()
+    return json.dumps([digest.to_dict() for digest in digests], indent=2)
+
+
+def diff_digests(expected: TableDigest, actual: TableDigest) -> dict:
+    """Lists the row-count, column and key-bucket differences between two digests."""
+    mismatched_buckets = []
+    for bucket in sorted(set(expected.buckets) | set(actual.buckets)):
+        want = expected.buckets.get(bucket, [0, 0])
+        got = actual.buckets.get(bucket, [0, 0])
+        if want != got:
+            mismatched_buckets.append(
+                {"bucket": bucket, "expected_rows": want[0], "actual_rows": got[0]}
+            )
+    return {
+        "row_count": (expected.row_count, actual.row_count),
+        "match": expected.checksum == actual.checksum
+        and expected.row_count == actual.row_count
+        and expected.column_checksums == actual.column_checksums,
+        "mismatched_columns": sorted(
+            col
+            for col in set(expected.column_checksums) | set(actual.column_checksums)
+            if expected.column_checksums.get(col) != actual.column_checksums.get(col)
+        ),
+        "mismatched_buckets": mismatched_buckets,
+    }
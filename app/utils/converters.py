@@ -0,0 +1,240 @@
+import itertools
+import json
+from typing import Iterable, Iterator, TextIO
+from bson import ObjectId
+
+FETCH_BATCH_SIZE = 1000
+MERGE_BATCH_SIZE = 500
+
+
+def _convert_mongo_types(doc):
+    if isinstance(doc, dict):
+        return {key: _convert_mongo_types(value) for key, value in doc.items()}
+    elif isinstance(doc, list):
+        return [_convert_mongo_types(item) for item in doc]
+    elif isinstance(doc, ObjectId):
+        return str(doc)
+    return doc
+
+
+def normalize_sql_row(row: dict) -> dict:
+    """Converts date/time values of a SQL row to ISO strings in place."""
+    for key, value in row.items():
+        if hasattr(value, "isoformat"):
+            row[key] = value.isoformat()
+    return row
+
+
+def iter_sql_rows(
+    conn,
+    table: str,
+    where: str = "",
+    params: tuple = (),
+    batch_size: int = FETCH_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Streams the rows of a SQL table as dicts using any DB-API connection."""
+    cursor = conn.cursor()
+    try:
+        query = f"SELECT * FROM {table}"
+        if where:
+            query += f" WHERE {where}"
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for values in batch:
+                yield normalize_sql_row(dict(zip(columns, values)))
+    finally:
+        cursor.close()
+
+
+def iter_mongo_documents(
+    collection, query: dict | None = None, batch_size: int = FETCH_BATCH_SIZE
+) -> Iterator[dict]:
+    """Streams the documents of a MongoDB collection with ObjectIds as strings."""
+    for doc in collection.find(query or {}).batch_size(batch_size):
+        yield _convert_mongo_types(doc)
+
+
+def json_array_items(docs: list) -> str:
+    """Renders documents the way they appear inside an indented JSON array.
+
+    One `json.dumps` call for the whole list is far cheaper than one per
+    document; the outer brackets are cut off so results can be joined.
+    """
+    return json.dumps(docs, indent=2)[2:-2] if docs else ""
+
+
+def write_json_array(
+    documents: Iterable[dict], out: TextIO, batch_size: int = FETCH_BATCH_SIZE
+) -> None:
+    """Writes documents as an indented JSON array, one batch at a time."""
+    documents = iter(documents)
+    first = True
+    while batch := list(itertools.islice(documents, batch_size)):
+        out.write("[\n" if first else ",\n")
+        out.write(json_array_items(batch))
+        first = False
+    out.write("[]" if first else "\n]")
+
+
+def sql_type(column: str, sample_val) -> str:
+    if isinstance(sample_val, int):
+        return "INT"
+    elif isinstance(sample_val, float):
+        # DOUBLE keeps Python floats intact; FLOAT would round them to ~7 digits.
+        return "DOUBLE"
+    elif isinstance(sample_val, bool):
+        return "BOOLEAN"
+    elif column == "_id":
+        return "VARCHAR(24)"
+    return "VARCHAR(255)"
+
+
+def _sql_value(val) -> str:
+    if val is None:
+        return "NULL"
+    elif isinstance(val, bool):
+        return str(val).upper()
+    elif isinstance(val, (int, float)):
+        return str(val)
+    elif isinstance(val, (dict, list)):
+        val = json.dumps(val, default=str)
+    return f"""'{str(val).replace("'", "''")}'"""
+
+
+def sql_create_statement(
+    table_name: str, column_types: dict[str, str], merge_key: str | None = None
+) -> str:
+    """Returns the CREATE TABLE statement for the given column types.
+
+    With `merge_key`, the table is created only if missing and is keyed on
+    that column so merge inserts can update existing rows.
+    """
+    column_defs = ",\n".join(
+        f"  `{col}` {sql_type}" for col, sql_type in column_types.items()
+    )
+    if merge_key is None:
+        return f"CREATE TABLE `{table_name}` (\n{column_defs}\n);\n\n"
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{table_name}` (\n{column_defs},\n"
+        f"  PRIMARY KEY (`{merge_key}`)\n);\n\n"
+    )
+
+
+def write_sql_inserts(
+    table_name: str,
+    columns: list[str],
+    documents: Iterable[dict],
+    out: TextIO,
+    merge_key: str | None = None,
+    batch_size: int = MERGE_BATCH_SIZE,
+) -> None:
+    """Writes the INSERT statements for every document against `columns`.
+
+    Plain mode writes one INSERT per document. With `merge_key`, rows are
+    written as batched `INSERT ... ON DUPLICATE KEY UPDATE` statements so
+    the script can be re-run against an existing table.
+    """
+    if merge_key is None:
+        prefix = f"INSERT INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES ("
+        for doc in documents:
+            values = ", ".join(_sql_value(doc.get(col)) for col in columns)
+            out.write(f"{prefix}{values});\n")
+        return
+
+    updates = (
+        ", ".join(f"`{col}` = VALUES(`{col}`)" for col in columns if col != merge_key)
+        or f"`{merge_key}` = `{merge_key}`"
+    )
+    prefix = f"INSERT INTO `{table_name}` (`{'`, `'.join(columns)}`) VALUES\n"
+    suffix = f"\nON DUPLICATE KEY UPDATE {updates};\n"
+    documents = iter(documents)
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            break
+        values = ",\n".join(
+            f"({', '.join(_sql_value(doc.get(col)) for col in columns)})"
+            for doc in batch
+        )
+        out.write(f"{prefix}{values}{suffix}")
+
+
+def project_to_first_columns(documents: Iterable[dict]) -> Iterator[dict]:
+    """Yields each document restricted to the fields of the first one.
+
+    These are the rows `write_sql_script` stores, so checksums taken on
+    them match the target table.
+    """
+    columns = None
+    for doc in documents:
+        if columns is None:
+            columns = list(doc.keys())
+        yield {col: doc.get(col) for col in columns}
+
+
+def write_sql_script(
+    table_name: str,
+    documents: Iterable[dict],
+    out: TextIO,
+    merge_key: str | None = None,
+    batch_size: int = MERGE_BATCH_SIZE,
+) -> None:
+    """Writes a CREATE TABLE statement followed by the INSERTs for every document.
+
+    The schema is inferred from the first document; later documents are
+    written against the same column list.
+    """
+    documents = iter(documents)
+    first = next(documents, None)
+    if first is None:
+        out.write("-- No data to convert.")
+        return
+    columns = list(first.keys())
+    if merge_key is not None and merge_key not in columns:
+        raise ValueError(f"Merge key '{merge_key}' is not a column of the data.")
+    column_types = {col: sql_type(col, first[col]) for col in columns}
+    out.write(sql_create_statement(table_name, column_types, merge_key))
+    rows = itertools.chain([first], documents)
+    write_sql_inserts(table_name, columns, rows, out, merge_key, batch_size)
+
+
+def iter_upserted(
+    collection,
+    documents: Iterable[dict],
+    key: str,
+    replace: bool = True,
+    batch_size: int = MERGE_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Passes documents through while upserting them into a MongoDB collection.
+
+    Documents are sent in unordered `bulk_write` batches of `ReplaceOne`
+    (or `UpdateOne` with `$set` when `replace` is False), both with
+    `upsert=True`, keyed on `key`.
+    """
+    from pymongo import ReplaceOne, UpdateOne
+
+    batch = []
+    for doc in documents:
+        if key not in doc:
+            raise ValueError(f"Document is missing merge key '{key}'.")
+        if replace:
+            batch.append(ReplaceOne({key: doc[key]}, doc, upsert=True))
+        else:
+            batch.append(UpdateOne({key: doc[key]}, {"$set": doc}, upsert=True))
+        if len(batch) >= batch_size:
+            collection.bulk_write(batch, ordered=False)
+            batch = []
+        yield doc
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+
+
+def load_json_documents(path) -> list[dict]:
+    """Loads a JSON file and returns its records as a list."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
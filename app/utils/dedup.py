@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+from typing import Iterable, Iterator
+
+MEMORY_KEY_LIMIT = 1_000_000
+
+
+def _fingerprint(key) -> bytes:
+    text = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class SpillingKeyMap:
+    """Maps keys to integers, moving to an on-disk SQLite table when it grows.
+
+    Keys are stored as 16-byte fingerprints. Up to `memory_limit` of them are
+    kept in memory; beyond that they are flushed to a temporary database, so
+    memory stays bounded however many distinct keys the source has.
+    """
+
+    def __init__(self, memory_limit: int = MEMORY_KEY_LIMIT):
+        self.memory_limit = memory_limit
+        self._memory: dict[bytes, int] = {}
+        self._path = None
+        self._conn = None
+
+    def _spill(self) -> None:
+        if self._conn is None:
+            fd, self._path = tempfile.mkstemp(suffix=".keys.db")
+            os.close(fd)
+            self._conn = sqlite3.connect(self._path)
+            self._conn.execute(
+                "CREATE TABLE seen (k BLOB PRIMARY KEY, v INTEGER) WITHOUT ROWID"
+            )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO seen VALUES (?, ?)", self._memory.items()
+        )
+        self._conn.commit()
+        self._memory.clear()
+
+    def _get(self, fingerprint: bytes) -> int | None:
+        value = self._memory.get(fingerprint)
+        if value is not None or self._conn is None:
+            return value
+        row = self._conn.execute(
+            "SELECT v FROM seen WHERE k = ?", (fingerprint,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, key) -> int | None:
+        return self._get(_fingerprint(key))
+
+    def put(self, key, value: int) -> int | None:
+        """Stores `value` for the key and returns the one it replaced, if any."""
+        fingerprint = _fingerprint(key)
+        previous = self._get(fingerprint)
+        self._memory[fingerprint] = value
+        if len(self._memory) >= self.memory_limit:
+            self._spill()
+        return previous
+
+    def close(self) -> None:
+        self._memory.clear()
+        if self._conn is not None:
+            self._conn.close()
+            os.remove(self._path)
+            self._conn = None
+
+
+def merge_key_value(record, key: str):
+    """Returns the record's merge key, rejecting records that cannot be merged.
+
+    A missing or null key would become a NULL primary key in the SQL script
+    and fail the whole batch, so both outputs refuse such records up front.
+    """
+    value = record.get(key) if isinstance(record, dict) else None
+    if value is None:
+        raise ValueError(f"Record is missing merge key '{key}': {record!r:.200}")
+    return value
+
+
+def dedupe_by_key(
+    records: Iterable[dict], key: str, memory_limit: int = MEMORY_KEY_LIMIT
+) -> Iterator[dict]:
+    """Yields only the last record for each `key` value, in stream order.
+
+    The last occurrence wins, as it would if every record were upserted
+    into the target in turn. Records are spooled to a temporary file while
+    the position of each key's last occurrence is recorded, then read back
+    keeping only those positions. Records without the key raise ValueError
+    (see `merge_key_value`).
+    """
+    last = SpillingKeyMap(memory_limit)
+    try:
+        with tempfile.TemporaryFile() as spool:
+            count = 0
+            for count, record in enumerate(records, 1):
+                last.put(merge_key_value(record, key), count)
+                pickle.dump(record, spool, pickle.HIGHEST_PROTOCOL)
+            spool.seek(0)
+            for position in range(1, count + 1):
+                record = pickle.load(spool)
+                if last.get(record[key]) == position:
+                    yield record
+    finally:
+        last.close()
+
+
+def prepare_rows(rows: Iterable, digest, merge_key: str | None = None) -> Iterator:
+    """Keeps the last row per key in merge mode and feeds the rows into `digest`.
+
+    Shared by the app's serial conversions and the benchmarks, so both
+    measure the same work.
+    """
+    if merge_key is not None:
+        rows = dedupe_by_key(rows, merge_key)
+    return digest.track(rows)
@@ -0,0 +1,512 @@
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Literal, NamedTuple, TextIO
+
+from app.utils.checksums import VALUE_COLUMN, TableDigest
+from app.utils.converters import (
+    iter_upserted,
+    json_array_items,
+    sql_create_statement,
+    sql_type,
+    write_sql_inserts,
+)
+from app.utils.dedup import SpillingKeyMap, merge_key_value
+
+JsonFormat = Literal["array", "ndjson", "object"]
+
+SHARD_BYTES = 64 * 1024 * 1024
+# Bytes scanned around each target offset when guessing an array cut point.
+CUT_WINDOW = 256 * 1024
+# A JSON string (with escapes) or a bracket; commas and scalars are not needed
+# to find where top-level array elements end.
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+_SEPARATOR = re.compile(rb"\s*,")
+
+
+class Shard(NamedTuple):
+    path: str
+    format: JsonFormat
+    start: int
+    end: int
+    # False when the array cut ending this shard was guessed, not scanned.
+    exact: bool = True
+
+
+class ShardBoundaryError(ValueError):
+    """A guessed array cut point split an element; the shard must be re-planned."""
+
+
+class EncodeTask(NamedTuple):
+    shard: Shard
+    output: Literal["sql", "json"]
+    table: str
+    columns: list[str]
+    key: str
+    merge_key: str | None
+    skip: frozenset
+    mongo_target: tuple[str, str, str] | None
+
+
+def detect_format(path) -> JsonFormat:
+    """Tells a top-level array, NDJSON and a single JSON document apart."""
+    with open(path, "rb") as f:
+        head = f.read(1024 * 1024).lstrip()
+        if head.startswith(b"["):
+            return "array"
+        f.seek(0)
+        first_line = f.readline().strip()
+    try:
+        json.loads(first_line)
+    except ValueError:
+        return "object"
+    return "ndjson"
+
+
+def _line_shards(mm, shard_bytes: int) -> list[tuple[int, int]]:
+    ranges, start, size = [], 0, len(mm)
+    while start < size:
+        end = min(start + shard_bytes, size)
+        if end < size:
+            newline = mm.find(b"\n", end)
+            end = size if newline == -1 else newline + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _scan_array_shards(mm, start: int, shard_bytes: int) -> list[tuple[int, int]]:
+    """Cuts a top-level array into element-aligned byte ranges.
+
+    `start` must sit between two elements (or just after the opening
+    bracket). Ranges cover whole elements without the enclosing brackets or
+    the separating commas, so `b"[" + mm[start:end] + b"]"` parses on its
+    own. Only object and array elements are used as cut points. Every byte
+    from `start` on is tokenized, so this is exact but slow.
+    """
+    shard_start = start
+    end = len(mm)
+    target = shard_start + shard_bytes
+    ranges, depth = [], 0
+    for match in _TOKEN.finditer(mm, shard_start):
+        char = mm[match.start()]
+        if char == 0x22:  # '"'
+            continue
+        if char in (0x5B, 0x7B):  # '[' or '{'
+            depth += 1
+            continue
+        depth -= 1
+        if depth < 0:
+            end = match.start()
+            break
+        if depth == 0 and match.end() >= target:
+            ranges.append((shard_start, match.end()))
+            separator = _SEPARATOR.match(mm, match.end())
+            shard_start = separator.end() if separator else match.end()
+            target = shard_start + shard_bytes
+    ranges.append((shard_start, end))
+    return ranges
+
+
+def _guess_cut(mm, target: int, end: int) -> tuple[int, int] | None:
+    """Guesses the first element boundary at or after `target`.
+
+    Tokenizes a window starting at the next newline (raw newlines never
+    occur inside JSON strings) and picks the first closing bracket at the
+    shallowest depth reached that is followed by a comma. That is the
+    array level unless a single element spans the whole window, so the
+    window doubles until a cut is found. Returns the end of the element and
+    the start of the next one, or None when no cut exists before `end`.
+    """
+    window = CUT_WINDOW
+    while True:
+        lo = target
+        newline = mm.find(b"\n", target, min(target + window, end))
+        if newline != -1:
+            lo = newline + 1
+        hi = min(lo + window, end)
+        depth, lowest, cut = 0, None, None
+        for match in _TOKEN.finditer(mm, lo, hi):
+            char = mm[match.start()]
+            if char == 0x22:
+                continue
+            if char in (0x5B, 0x7B):
+                depth += 1
+                continue
+            depth -= 1
+            if lowest is None or depth < lowest:
+                lowest, cut = depth, None
+            if depth == lowest and cut is None:
+                separator = _SEPARATOR.match(mm, match.end())
+                if separator:
+                    cut = (match.end(), separator.end())
+        if cut is not None:
+            return cut
+        if hi >= end:
+            return None
+        window *= 2
+
+
+def _array_shards(mm, shard_bytes: int) -> list[tuple[int, int]]:
+    """Cuts a top-level array into byte ranges at guessed element boundaries.
+
+    Only a window around each target offset is scanned, so planning does
+    not read the whole file. A wrong guess makes the shard before it fail
+    to parse (see `parse_shard`), and `_map_shards` then re-plans the rest
+    of the file with `_scan_array_shards`.
+    """
+    start = mm.find(b"[") + 1
+    end = mm.rfind(b"]")
+    if end < start:
+        end = len(mm)
+    ranges = []
+    while start + shard_bytes < end:
+        cut = _guess_cut(mm, start + shard_bytes, end)
+        if cut is None:
+            break
+        ranges.append((start, cut[0]))
+        start = cut[1]
+    ranges.append((start, end))
+    return ranges
+
+
+def plan_shards(path, shard_bytes: int = SHARD_BYTES) -> list[Shard]:
+    """Splits one JSON file into shards that can be parsed independently."""
+    path = str(path)
+    fmt = detect_format(path)
+    if fmt == "object" or os.path.getsize(path) == 0:
+        return [Shard(path, fmt, 0, os.path.getsize(path))]
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if fmt == "ndjson":
+                return [
+                    Shard(path, fmt, start, end)
+                    for start, end in _line_shards(mm, shard_bytes)
+                ]
+            ranges = _array_shards(mm, shard_bytes)
+    return [Shard(path, fmt, start, end, exact=False) for start, end in ranges]
+
+
+def _replan_from(shard: Shard, shard_bytes: int) -> list[Shard]:
+    """Exactly re-plans a file's array shards from `shard.start` onward."""
+    with open(shard.path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = _scan_array_shards(mm, shard.start, shard_bytes)
+    return [Shard(shard.path, shard.format, start, end) for start, end in ranges]
+
+
+def parse_shard(shard: Shard) -> list:
+    """Parses the records of one shard."""
+    with open(shard.path, "rb") as f:
+        f.seek(shard.start)
+        data = f.read(shard.end - shard.start)
+    if shard.format == "ndjson":
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+    if shard.format == "array":
+        try:
+            return json.loads(b"[" + data + b"]")
+        except json.JSONDecodeError:
+            # Shards before this one parsed, so its start is a real boundary
+            # and only its guessed end can be wrong (or the file is invalid).
+            if shard.exact:
+                raise
+            raise ShardBoundaryError(
+                f"{shard.path}: no element boundary at byte {shard.end}"
+            ) from None
+    data = json.loads(data)
+    return data if isinstance(data, list) else [data]
+
+
+def _first_record(shards: list[Shard]):
+    for shard in shards:
+        if shard.format == "object":
+            records = parse_shard(shard)
+            return records[0] if records else None
+        with open(shard.path, "rb") as f:
+            f.seek(shard.start)
+            text = f.read(shard.end - shard.start).decode()
+        text = text.lstrip()
+        if text:
+            return json.JSONDecoder().raw_decode(text)[0]
+    return None
+
+
+def _shard_keys(args: tuple[Shard, str]) -> list[tuple[int, object]]:
+    shard, key = args
+    return [(i, merge_key_value(r, key)) for i, r in enumerate(parse_shard(shard))]
+
+
+def _encode_shard(task: EncodeTask) -> tuple[str, dict, TableDigest]:
+    """Parses and encodes one shard; returns its text, column types and digest."""
+    records = parse_shard(task.shard)
+    if task.skip:
+        records = [r for i, r in enumerate(records) if i not in task.skip]
+    types: dict[str, set] = {col: set() for col in task.columns}
+    if task.output == "sql":
+        for record in records:
+            if not isinstance(record, dict):
+                raise ValueError(_not_an_object(task.shard.path, record))
+            for col in task.columns:
+                value = record.get(col)
+                if value is not None:
+                    types[col].add(sql_type(col, value))
+    # SQL rows hold only the script's columns; documents keep every field.
+    digest = TableDigest(
+        task.table, task.key, task.columns if task.output == "sql" else None
+    )
+    rows: Iterable[dict] = digest.track(records)
+    client = None
+    if task.mongo_target is not None:
+        import pymongo
+
+        conn_string, database, collection = task.mongo_target
+        client = pymongo.MongoClient(conn_string)
+        rows = iter_upserted(client[database][collection], rows, task.merge_key)
+    out = io.StringIO()
+    try:
+        if task.output == "sql":
+            write_sql_inserts(task.table, task.columns, rows, out, task.merge_key)
+        else:
+            out.write(json_array_items(list(rows)))
+    finally:
+        if client is not None:
+            client.close()
+    return (
+        out.getvalue(),
+        {col: sorted(t) for col, t in types.items()},
+        digest,
+    )
+
+
+def _not_an_object(path, record) -> str:
+    return (
+        f"{os.path.basename(path)} contains a non-object record "
+        f"({type(record).__name__}); only JSON objects can become SQL rows."
+    )
+
+
+def merge_sql_types(column: str, types: Iterable[str]) -> str:
+    """Widens the SQL types seen for a column across shards to one type."""
+    types = set(types)
+    if not types:
+        return sql_type(column, None)
+    if len(types) == 1:
+        return types.pop()
+    if types <= {"INT", "DOUBLE"}:
+        return "DOUBLE"
+    return "VARCHAR(255)"
+
+
+class _Runner:
+    """Maps work over a process pool, or inline when there is only one worker."""
+
+    def __init__(self, workers: int | None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+
+    def map(self, fn, items: list):
+        if self.workers == 1 or len(items) <= 1:
+            return map(fn, items)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.pool.map(fn, items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def _map_shards(runner: _Runner, fn, shards: list[Shard], task, shard_bytes: int):
+    """Yields `fn(task(i))` for every shard index in order.
+
+    When a guessed array cut turns out to split an element, the shards of
+    that file from the failed one onward are re-planned exactly, in place,
+    and processing resumes there. Results already yielded stay valid.
+    """
+    done = 0
+    while done < len(shards):
+        try:
+            for result in runner.map(fn, [task(i) for i in range(done, len(shards))]):
+                yield result
+                done += 1
+        except ShardBoundaryError:
+            failed = shards[done]
+            rest = [shard for shard in shards[done:] if shard.path != failed.path]
+            shards[done:] = _replan_from(failed, shard_bytes) + rest
+
+
+def _skip_duplicates(
+    runner: _Runner,
+    shards: list[Shard],
+    key: str,
+    last: SpillingKeyMap,
+    shard_bytes: int,
+) -> list[set]:
+    """Finds, per shard, the record indexes whose key appears again later.
+
+    Each key maps to the position of its latest record; when a later record
+    replaces it, the earlier position is skipped, so the last one wins.
+    """
+    skips: list[set] = []
+    for keys in _map_shards(
+        runner, _shard_keys, shards, lambda i: (shards[i], key), shard_bytes
+    ):
+        shard_index = len(skips)
+        skips.append(set())
+        for i, value in keys:
+            previous = last.put(value, (shard_index << 32) | i)
+            if previous is not None:
+                skips[previous >> 32].add(previous & 0xFFFFFFFF)
+    return skips
+
+
+def _encode(
+    runner: _Runner,
+    shards: list[Shard],
+    skips: list[set] | None,
+    shard_bytes: int,
+    **task_fields,
+):
+    def task(i: int) -> EncodeTask:
+        skip = frozenset(skips[i]) if skips else frozenset()
+        return EncodeTask(shard=shards[i], skip=skip, **task_fields)
+
+    return _map_shards(runner, _encode_shard, shards, task, shard_bytes)
+
+
+def convert_json_files_to_sql(
+    paths: list,
+    out: TextIO,
+    merge_key: str | None = None,
+    workers: int | None = None,
+    shard_bytes: int = SHARD_BYTES,
+) -> list[TableDigest]:
+    """Converts each JSON file into its own table of one SQL script.
+
+    Files are split into shards that are parsed and encoded in a process
+    pool. Column names come from the first record of each file and column
+    types are widened across all shards.
+    """
+    digests = []
+    with _Runner(workers) as runner:
+        for path in paths:
+            table = os.path.splitext(os.path.basename(path))[0]
+            shards = plan_shards(path, shard_bytes)
+            first = _first_record(shards)
+            if first is None:
+                out.write(f"-- {table}: no data to convert.\n\n")
+                continue
+            if not isinstance(first, dict):
+                raise ValueError(_not_an_object(path, first))
+            columns = list(first.keys())
+            if merge_key is not None and merge_key not in columns:
+                raise ValueError(
+                    f"Merge key '{merge_key}' is not a column of {os.path.basename(path)}."
+                )
+            skips = None
+            if merge_key is not None:
+                last = SpillingKeyMap()
+                try:
+                    skips = _skip_duplicates(
+                        runner, shards, merge_key, last, shard_bytes
+                    )
+                finally:
+                    last.close()
+            digest = TableDigest(table, merge_key or columns[0], columns)
+            types: dict[str, set] = {col: set() for col in columns}
+            # INSERTs are spooled to disk because CREATE TABLE needs the
+            # column types of every shard first.
+            with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+                for text, shard_types, shard_digest in _encode(
+                    runner,
+                    shards,
+                    skips,
+                    shard_bytes,
+                    output="sql",
+                    table=table,
+                    columns=columns,
+                    key=digest.key,
+                    merge_key=merge_key,
+                    mongo_target=None,
+                ):
+                    spool.write(text)
+                    for col, seen_types in shard_types.items():
+                        types[col].update(seen_types)
+                    digest.merge(shard_digest)
+                column_types = {
+                    col: merge_sql_types(col, types[col]) for col in columns
+                }
+                out.write(sql_create_statement(table, column_types, merge_key))
+                spool.seek(0)
+                shutil.copyfileobj(spool, out)
+            out.write("\n")
+            digests.append(digest)
+    return digests
+
+
+def convert_json_files_to_json(
+    paths: list,
+    out: TextIO,
+    collection: str,
+    merge_key: str | None = None,
+    mongo_target: tuple[str, str] | None = None,
+    workers: int | None = None,
+    shard_bytes: int = SHARD_BYTES,
+) -> TableDigest:
+    """Converts JSON files into one indented JSON array of documents.
+
+    Shards are parsed and encoded in a process pool and concatenated in
+    file order. In merge mode, keys are deduplicated across all files,
+    keeping the last record for each key, and, given a `(conn_string, database)` target, each worker upserts its
+    shard into `collection`.
+    """
+    shards = [shard for path in paths for shard in plan_shards(path, shard_bytes)]
+    first = _first_record(shards)
+    # Arrays of scalars have no columns; their records hash as one value.
+    columns = list(first.keys()) if isinstance(first, dict) else []
+    digest = TableDigest(
+        collection, merge_key or (columns[0] if columns else VALUE_COLUMN)
+    )
+    target = None
+    if merge_key is not None and mongo_target is not None:
+        target = (*mongo_target, collection)
+    with _Runner(workers) as runner:
+        skips = None
+        if merge_key is not None:
+            last = SpillingKeyMap()
+            try:
+                skips = _skip_duplicates(runner, shards, merge_key, last, shard_bytes)
+            finally:
+                last.close()
+        wrote = False
+        for text, _, shard_digest in _encode(
+            runner,
+            shards,
+            skips,
+            shard_bytes,
+            output="json",
+            table=collection,
+            columns=columns,
+            key=digest.key,
+            merge_key=merge_key,
+            mongo_target=target,
+        ):
+            digest.merge(shard_digest)
+            if text:
+                out.write(",\n" if wrote else "[\n")
+                out.write(text)
+                wrote = True
+        out.write("\n]" if wrote else "[]")
+    return digest
@@ -0,0 +1,229 @@
+"""Verifies a migrated table or collection against a conversion's checksum manifest.
+
+Usage:
+    python -m app.utils.verify orders.checksums.json mysql \\
+        --host localhost --user root --password secret --database shop
+    python -m app.utils.verify orders.checksums.json mongo \\
+        --uri mongodb://localhost --database shop
+    python -m app.utils.verify orders.checksums.json json --file orders.json
+
+When the target has an index on the merge key, it is scanned in parallel
+key ranges cut from the manifest's key sample; otherwise it is streamed
+once. Rows are bucketed by key hash either way, and only the buckets whose
+digests differ are reported.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.checksums import TableDigest, diff_digests
+from app.utils.converters import (
+    iter_mongo_documents,
+    iter_sql_rows,
+    load_json_documents,
+)
+
+DEFAULT_WORKERS = 8
+
+
+class MySQLTarget:
+    def __init__(self, host, port, user, password, database, table):
+        self.params = dict(
+            host=host, port=port, user=user, password=password, database=database
+        )
+        self.table = table
+
+    def _scan(self, where: str = "", params: tuple = ()):
+        import mysql.connector
+
+        conn = mysql.connector.connect(**self.params)
+        try:
+            yield from iter_sql_rows(conn, f"`{self.table}`", where, params)
+        finally:
+            conn.close()
+
+    def _query_one(self, query: str, params: tuple = ()):
+        import mysql.connector
+
+        conn = mysql.connector.connect(**self.params)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            cursor.fetchall()
+            cursor.close()
+            return row
+        finally:
+            conn.close()
+
+    def can_partition(self, key: str, bounds: list) -> bool:
+        """Range scans need an index led by the key, or each one reads the table.
+
+        String keys are left out because the column's collation may not
+        order them the way the manifest's bounds were sorted.
+        """
+        if not all(type(bound) is int for bound in bounds):
+            return False
+        return (
+            self._query_one(
+                f"SHOW INDEX FROM `{self.table}` WHERE Column_name = %s"
+                " AND Seq_in_index = 1",
+                (key,),
+            )
+            is not None
+        )
+
+    def fetch_range(self, key: str, low, high):
+        clauses, params = [], ()
+        if low is not None:
+            clauses.append(f"`{key}` >= %s")
+            params += (low,)
+        if high is not None:
+            clauses.append(f"`{key}` < %s")
+            params += (high,)
+        return self._scan(" AND ".join(clauses), params)
+
+    def fetch_all(self):
+        return self._scan()
+
+    def count(self) -> int:
+        (total,) = self._query_one(f"SELECT COUNT(*) FROM `{self.table}`")
+        return total
+
+
+class MongoTarget:
+    def __init__(self, uri, database, collection):
+        import pymongo
+
+        self.client = pymongo.MongoClient(uri)
+        self.collection = self.client[database][collection]
+
+    def can_partition(self, key: str, bounds: list) -> bool:
+        """Range scans need an ascending or descending index led by the key."""
+        if key == "_id":
+            return True
+        return any(
+            index["key"][0][0] == key and index["key"][0][1] in (1, -1)
+            for index in self.collection.index_information().values()
+        )
+
+    def fetch_range(self, key: str, low, high):
+        condition = {}
+        if low is not None:
+            condition["$gte"] = low
+        if high is not None:
+            condition["$lt"] = high
+        return iter_mongo_documents(self.collection, {key: condition})
+
+    def fetch_all(self):
+        return iter_mongo_documents(self.collection)
+
+    def count(self) -> int:
+        return self.collection.count_documents({})
+
+    def close(self):
+        self.client.close()
+
+
+class JsonFileTarget:
+    def __init__(self, path):
+        self.path = path
+
+    def can_partition(self, key: str, bounds: list) -> bool:
+        return False
+
+    def fetch_all(self):
+        return load_json_documents(self.path)
+
+
+def _digest_rows(template: TableDigest, rows) -> TableDigest:
+    digest = template.empty_like()
+    for row in rows:
+        digest.add(row)
+    return digest
+
+
+def verify(manifest: dict, target, workers: int = DEFAULT_WORKERS) -> dict:
+    """Computes the manifest's digests on `target` and reports the differences."""
+    expected = TableDigest.from_dict(manifest)
+    actual = expected.empty_like()
+    bounds = expected.key_bounds()
+    unscanned_rows = 0
+    if bounds and target.can_partition(expected.key, bounds):
+        edges = [None, *bounds, None]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(
+                lambda i: _digest_rows(
+                    expected, target.fetch_range(expected.key, edges[i], edges[i + 1])
+                ),
+                range(len(edges) - 1),
+            )
+            for part in parts:
+                actual.merge(part)
+        # Rows whose key is null or of another type fall outside every range.
+        unscanned_rows = target.count() - actual.row_count
+    else:
+        actual = _digest_rows(expected, target.fetch_all())
+    report = diff_digests(expected, actual)
+    report["unscanned_rows"] = unscanned_rows
+    report["match"] = report["match"] and unscanned_rows == 0
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="checksum manifest produced by a conversion")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--table", help="target table or collection (defaults to the manifest's)"
+    )
+    targets = parser.add_subparsers(dest="target", required=True)
+    mysql_args = targets.add_parser("mysql")
+    mysql_args.add_argument("--host", default="localhost")
+    mysql_args.add_argument("--port", type=int, default=3306)
+    mysql_args.add_argument("--user", required=True)
+    mysql_args.add_argument("--password", default="")
+    mysql_args.add_argument("--database", required=True)
+    mongo_args = targets.add_parser("mongo")
+    mongo_args.add_argument("--uri", required=True)
+    mongo_args.add_argument("--database", required=True)
+    json_args = targets.add_parser("json")
+    json_args.add_argument("--file", required=True)
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        manifests = json.load(f)
+    # Conversions of several files into several tables produce a list.
+    if isinstance(manifests, dict):
+        manifests = [manifests]
+    if args.table and len(manifests) > 1:
+        parser.error("--table only applies to single-table manifests")
+    try:
+        for manifest in manifests:
+            TableDigest.from_dict(manifest)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    reports = []
+    for manifest in manifests:
+        table = args.table or manifest["table"]
+        if args.target == "mysql":
+            target = MySQLTarget(
+                args.host, args.port, args.user, args.password, args.database, table
+            )
+        elif args.target == "mongo":
+            target = MongoTarget(args.uri, args.database, table)
+        else:
+            target = JsonFileTarget(args.file)
+        report = verify(manifest, target, args.workers)
+        if isinstance(target, MongoTarget):
+            target.close()
+        reports.append({"table": table, **report})
+    print(json.dumps(reports[0] if len(reports) == 1 else reports, indent=2))
+    return 0 if all(report["match"] for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import json
+import random
+import string
+from typing import Iterator, Literal
+
+Shape = Literal["wide", "narrow", "nested", "skewed"]
+SHAPES: tuple[Shape, ...] = ("wide", "narrow", "nested", "skewed")
+WIDE_COLUMNS = 50
+
+
+def _word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+
+def _wide(rng: random.Random, i: int) -> dict:
+    record = {"id": i}
+    for col in range(1, WIDE_COLUMNS):
+        kind = col % 3
+        if kind == 0:
+            record[f"c{col}"] = rng.randint(0, 1_000_000)
+        elif kind == 1:
+            record[f"c{col}"] = round(rng.random() * 1000, 4)
+        else:
+            record[f"c{col}"] = _word(rng, 8)
+    return record
+
+
+def _narrow(rng: random.Random, i: int) -> dict:
+    return {"id": i, "name": _word(rng, 10), "score": rng.random()}
+
+
+def _nested(rng: random.Random, i: int) -> dict:
+    return {
+        "id": i,
+        "user": {"name": _word(rng, 8), "age": rng.randint(18, 90)},
+        "tags": [_word(rng, 5) for _ in range(rng.randint(0, 5))],
+        "orders": [
+            {"sku": _word(rng, 6), "qty": rng.randint(1, 9)}
+            for _ in range(rng.randint(0, 3))
+        ],
+    }
+
+
+def _skewed(rng: random.Random, i: int) -> dict:
+    # Zipf-like: a few very hot categories and occasional very long payloads.
+    category = min(int(rng.paretovariate(1.2)), 1000)
+    length = min(int(rng.paretovariate(1.1) * 8), 4096)
+    return {"id": i, "category": f"cat{category}", "payload": _word(rng, length)}
+
+
+_BUILDERS = {"wide": _wide, "narrow": _narrow, "nested": _nested, "skewed": _skewed}
+
+
+def generate_records(shape: Shape, rows: int, seed: int = 0) -> Iterator[dict]:
+    """Yields `rows` deterministic records of the given shape."""
+    rng = random.Random(f"{shape}:{seed}")
+    build = _BUILDERS[shape]
+    for i in range(rows):
+        yield build(rng, i)
+
+
+def flatten_for_sql(record: dict) -> dict:
+    """Serializes nested values so the record fits in a flat SQL row."""
+    return {
+        key: json.dumps(value) if isinstance(value, (dict, list)) else value
+        for key, value in record.items()
+    }
+
+
+def write_json_file(path, shape: Shape, rows: int, seed: int = 0) -> None:
+    """Streams generated records to `path` as a JSON array."""
+    with open(path, "w") as f:
+        f.write("[")
+        for i, record in enumerate(generate_records(shape, rows, seed)):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(record))
+        f.write("]")
+
+
+def write_json_file_of_size(
+    path, shape: Shape, size_bytes: int, seed: int = 0, ndjson: bool = False
+) -> int:
+    """Streams generated records to `path` until it reaches `size_bytes`.
+
+    Writes a JSON array, or one record per line with `ndjson`. Returns the
+    number of records written.
+    """
+    written = rows = 0
+    with open(path, "w") as f:
+        if not ndjson:
+            f.write("[")
+        for record in generate_records(shape, 2**62, seed):
+            line = json.dumps(record)
+            if ndjson:
+                line += "\n"
+            elif rows:
+                line = ",\n" + line
+            f.write(line)
+            written += len(line)
+            rows += 1
+            if written >= size_bytes:
+                break
+        if not ndjson:
+            f.write("]")
+    return rows
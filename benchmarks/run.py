@@ -0,0 +1,317 @@
+"""Reproducible benchmarks for the four DataBridge conversion paths.
+
+Usage:
+    python -m benchmarks.run --rows 1000 100000 --shapes wide nested
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --compare
+
+Every case runs in a fresh process so its peak RSS is not polluted by the
+previous case. With several workers, the reported peak RSS adds the largest
+worker's peak once per worker, an upper bound on the pool's footprint. Database-backed paths use local stand-ins: an on-disk SQLite
+database for the MySQL source and `mongomock` (``pip install mongomock``)
+for MongoDB.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.utils.converters import (
+    iter_mongo_documents,
+    iter_sql_rows,
+    project_to_first_columns,
+    write_json_array,
+    write_sql_script,
+)
+from app.utils.checksums import TableDigest
+from app.utils.dedup import prepare_rows
+from app.utils.parallel_json import (
+    convert_json_files_to_json,
+    convert_json_files_to_sql,
+)
+from benchmarks.generators import (
+    SHAPES,
+    flatten_for_sql,
+    generate_records,
+    write_json_file,
+)
+
+PATHS = ("sql_to_nosql", "nosql_to_sql", "json_to_sql", "json_to_nosql")
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+LOAD_BATCH_SIZE = 5000
+# mongomock keeps documents as Python dicts; past this it exhausts memory.
+MONGO_MAX_ROWS = 1_000_000
+TABLE = "bench"
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _batches(records, size: int = LOAD_BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _setup_sqlite(workdir: Path, shape: str, rows: int, seed: int):
+    db_path = workdir / "source.db"
+    conn = sqlite3.connect(db_path)
+    records = (flatten_for_sql(r) for r in generate_records(shape, rows, seed))
+    for batch in _batches(records):
+        columns = list(batch[0].keys())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({', '.join(columns)})")
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {TABLE} VALUES ({placeholders})",
+            [tuple(r.get(c) for c in columns) for r in batch],
+        )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _setup_mongo(shape: str, rows: int, seed: int):
+    import mongomock
+
+    coll = mongomock.MongoClient()["bench"][TABLE]
+    for batch in _batches(generate_records(shape, rows, seed)):
+        coll.insert_many(batch)
+    return coll
+
+
+def _run_case(
+    path: str,
+    shape: str,
+    rows: int,
+    seed: int,
+    merge_key: str | None = None,
+    workers: int = 1,
+) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        output = workdir / "output"
+        if path == "sql_to_nosql":
+            source = _setup_sqlite(workdir, shape, rows, seed)
+        elif path == "nosql_to_sql":
+            source = _setup_mongo(shape, rows, seed)
+        else:
+            source = workdir / "source.json"
+            write_json_file(source, shape, rows, seed)
+        setup_rss = _peak_rss_mb()
+
+        digest = TableDigest(TABLE, merge_key)
+
+        start = time.perf_counter()
+        with open(output, "w") as out:
+            if path == "sql_to_nosql":
+                conn = sqlite3.connect(source)
+                try:
+                    write_json_array(
+                        prepare_rows(iter_sql_rows(conn, TABLE), digest, merge_key),
+                        out,
+                    )
+                finally:
+                    conn.close()
+            elif path == "nosql_to_sql":
+                documents = prepare_rows(
+                    project_to_first_columns(iter_mongo_documents(source)),
+                    digest,
+                    merge_key,
+                )
+                write_sql_script(TABLE, documents, out, merge_key)
+            elif path == "json_to_sql":
+                convert_json_files_to_sql([source], out, merge_key, workers)
+            else:
+                convert_json_files_to_json(
+                    [source], out, TABLE, merge_key, workers=workers
+                )
+        seconds = time.perf_counter() - start
+        # RUSAGE_CHILDREN reports the largest finished worker, not the sum,
+        # so the total assumes every worker peaked at once: an upper bound.
+        worker_rss = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        peak_rss = _peak_rss_mb() + worker_rss * workers
+
+        return {
+            "path": path,
+            "shape": shape,
+            "rows": rows,
+            "merge_key": merge_key,
+            # Only the JSON paths shard across worker processes.
+            "workers": workers if path.startswith("json_") else 1,
+            "seconds": round(seconds, 4),
+            "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+            "setup_rss_mb": round(setup_rss, 1),
+            "peak_rss_mb": round(peak_rss, 1),
+            "worker_rss_mb": round(worker_rss, 1),
+            "output_bytes": os.path.getsize(output),
+        }
+
+
+def run_isolated(
+    path: str,
+    shape: str,
+    rows: int,
+    seed: int,
+    merge_key: str | None = None,
+    workers: int = 1,
+) -> dict:
+    """Runs one benchmark case in a freshly spawned interpreter."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(
+            _run_case, path, shape, rows, seed, merge_key, workers
+        ).result()
+
+
+def _case_key(result: dict) -> str:
+    key = f"{result['path']}/{result['shape']}/{result['rows']}"
+    key += f"/workers:{result.get('workers', 1)}"
+    if result.get("merge_key"):
+        key += f"/merge:{result['merge_key']}"
+    return key
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Returns a description of every case that regressed beyond `tolerance`."""
+    regressions = []
+    for result in results:
+        previous = baseline.get(_case_key(result))
+        if not previous:
+            continue
+        if (
+            previous.get("rows_per_sec")
+            and result["rows_per_sec"] is not None
+            and result["rows_per_sec"] < previous["rows_per_sec"] * (1 - tolerance)
+        ):
+            regressions.append(
+                f"{_case_key(result)}: throughput {result['rows_per_sec']:.0f} rows/s "
+                f"(baseline {previous['rows_per_sec']:.0f})"
+            )
+        if result["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{_case_key(result)}: peak RSS {result['peak_rss_mb']} MB "
+                f"(baseline {previous['peak_rss_mb']} MB)"
+            )
+        if result["output_bytes"] != previous["output_bytes"]:
+            regressions.append(
+                f"{_case_key(result)}: output size {result['output_bytes']} bytes "
+                f"(baseline {previous['output_bytes']} bytes)"
+            )
+    return regressions
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"{_case_key(result):<46} {result['seconds']:>10.3f}s "
+        f"{result['rows_per_sec'] or 0:>12.0f} rows/s "
+        f"{result['peak_rss_mb']:>9.1f} MB "
+        f"{result['output_bytes']:>14} B"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS))
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument(
+        "--rows",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_SIZES),
+        help=f"row counts to run (reference sizes: {', '.join(map(str, SIZES))})",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per case; the fastest is kept"
+    )
+    parser.add_argument(
+        "--merge-key",
+        help="benchmark merge mode (dedupe + upsert output) keyed on this field",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes for the JSON paths (see benchmarks.scaling)",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="allowed relative slowdown or RSS growth before flagging a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for path in args.paths:
+        for shape in args.shapes:
+            for rows in args.rows:
+                if path == "nosql_to_sql" and rows > MONGO_MAX_ROWS:
+                    print(
+                        f"{path}/{shape}/{rows}: skipped, mongomock is capped at "
+                        f"{MONGO_MAX_ROWS} rows"
+                    )
+                    continue
+                result = min(
+                    (
+                        run_isolated(
+                            path,
+                            shape,
+                            rows,
+                            args.seed,
+                            args.merge_key,
+                            args.workers,
+                        )
+                        for _ in range(max(args.repeat, 1))
+                    ),
+                    key=lambda r: r["seconds"],
+                )
+                _print_result(result)
+                results.append(result)
+
+    if args.save_baseline:
+        stored = {}
+        if args.baseline.exists():
+            stored = json.loads(args.baseline.read_text())
+        stored.update({_case_key(r): r for r in results})
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Core-scaling benchmark for the sharded JSON conversion paths.
+
+Usage:
+    python -m benchmarks.scaling --size-mb 2048 --format ndjson --output sql
+    python -m benchmarks.scaling --size-mb 4096 --workers 1 2 4 8 16
+
+Generates one large input file, then converts it with an increasing number
+of worker processes and reports wall time, throughput and speedup over the
+serial path (load the whole file, checksum and encode it in this process).
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils.checksums import TableDigest
+from app.utils.converters import (
+    load_json_documents,
+    write_json_array,
+    write_sql_script,
+)
+from app.utils.parallel_json import (
+    SHARD_BYTES,
+    convert_json_files_to_json,
+    convert_json_files_to_sql,
+)
+from benchmarks.generators import SHAPES, write_json_file_of_size
+
+
+def _default_workers() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def run_serial(source: Path, output: str, ndjson: bool, out_path: Path) -> float:
+    start = time.perf_counter()
+    if ndjson:
+        with open(source) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        records = load_json_documents(source)
+    digest = TableDigest("bench")
+    with open(out_path, "w") as out:
+        if output == "sql":
+            write_sql_script("bench", digest.track(records), out)
+        else:
+            write_json_array(digest.track(records), out)
+    return time.perf_counter() - start
+
+
+def run_scaling(
+    source: Path, output: str, workers: int, shard_bytes: int, out_path: Path
+) -> float:
+    start = time.perf_counter()
+    with open(out_path, "w") as out:
+        if output == "sql":
+            convert_json_files_to_sql(
+                [source], out, workers=workers, shard_bytes=shard_bytes
+            )
+        else:
+            convert_json_files_to_json(
+                [source], out, "bench", workers=workers, shard_bytes=shard_bytes
+            )
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--shape", choices=SHAPES, default="narrow")
+    parser.add_argument("--format", choices=("array", "ndjson"), default="ndjson")
+    parser.add_argument("--output", choices=("sql", "json"), default="sql")
+    parser.add_argument("--workers", nargs="+", type=int, default=_default_workers())
+    parser.add_argument("--shard-mb", type=int, default=SHARD_BYTES // (1024 * 1024))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workdir", type=Path, help="where to put the generated input and output"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        source = Path(tmp) / f"source.{'ndjson' if args.format == 'ndjson' else 'json'}"
+        rows = write_json_file_of_size(
+            source,
+            args.shape,
+            args.size_mb * 1024 * 1024,
+            args.seed,
+            ndjson=args.format == "ndjson",
+        )
+        size_mb = source.stat().st_size / (1024 * 1024)
+        print(f"Input: {size_mb:.0f} MB, {rows} {args.shape} records ({args.format})")
+        print(f"{'workers':>8} {'seconds':>10} {'MB/s':>10} {'speedup':>8}")
+        serial = run_serial(
+            source, args.output, args.format == "ndjson", Path(tmp) / "output"
+        )
+        print(f"{'serial':>8} {serial:>10.2f} {size_mb / serial:>10.1f} {1:>7.2f}x")
+        for workers in args.workers:
+            seconds = run_scaling(
+                source,
+                args.output,
+                workers,
+                args.shard_mb * 1024 * 1024,
+                Path(tmp) / "output",
+            )
+            print(
+                f"{workers:>8} {seconds:>10.2f} {size_mb / seconds:>10.1f} "
+                f"{serial / seconds:>7.2f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.utils.checksums import (
+    MANIFEST_VERSION,
+    PARTITIONS,
+    TableDigest,
+    _canonical,
+    diff_digests,
+)
+
+
+def _digest(rows, **kwargs) -> TableDigest:
+    digest = TableDigest("t", **kwargs)
+    for row in rows:
+        digest.add(row)
+    return digest
+
+
+def _verify(source, target) -> dict:
+    expected = _digest(source)
+    actual = expected.empty_like()
+    for row in target:
+        actual.add(row)
+    return diff_digests(expected, actual)
+
+
+def test_fields_missing_from_the_first_record_are_hashed():
+    source = [{"id": 1}, {"id": 2, "extra": "x"}]
+    report = _verify(source, [{"id": 1}, {"id": 2, "extra": "CORRUPT"}])
+    assert not report["match"]
+    assert report["mismatched_columns"] == ["extra"]
+    assert _verify(source, source)["match"]
+
+
+def test_missing_and_null_fields_are_equal():
+    source = [{"id": 1, "a": None}, {"id": 2, "b": 3}]
+    target = [{"id": 1, "a": None, "b": None}, {"b": 3, "id": 2, "a": None}]
+    assert _verify(source, target)["match"]
+
+
+def test_fields_added_by_the_target_are_ignored():
+    source = [{"id": 1, "name": "a"}, {"id": 2, "tags": ["x"]}]
+    target = [{**row, "_id": f"oid{i}"} for i, row in enumerate(source)]
+    assert _verify(source, target)["match"]
+
+
+def test_fixed_columns_hash_only_those_columns():
+    rows = [{"id": 1, "a": 1, "dropped": "x"}, {"id": 2, "a": 2, "dropped": "y"}]
+    digest = _digest(rows, columns=["id", "a"])
+    assert digest.hashed_columns() == ["id", "a"]
+    assert _digest([{"id": 1, "a": 1}, {"id": 2, "a": 2}]).checksum == digest.checksum
+
+
+def test_values_swapped_between_rows_are_caught():
+    source = [{"id": 1, "v": "a"}, {"id": 2, "v": "b"}]
+    report = _verify(source, [{"id": 1, "v": "b"}, {"id": 2, "v": "a"}])
+    assert not report["match"]
+    assert report["mismatched_columns"] == ["v"]
+
+
+def test_equal_values_canonicalize_alike():
+    assert _canonical(1) == _canonical(1.0) == _canonical(Decimal("1.00"))
+    assert _canonical(0.1) == _canonical(Decimal("0.1")) == "0.1"
+    assert _canonical(1e20) == _canonical(10**20)
+    assert _canonical(True) == "1"
+    assert _canonical(None) != _canonical("None")
+    assert _canonical({"b": 1, "a": [1, "x"]}) == '{"b": 1, "a": [1, "x"]}'
+
+
+def test_merged_parts_equal_the_whole_and_survive_a_round_trip():
+    rows = [{"id": i * 37, "v": f"row {i}", "n": i / 4} for i in range(500)]
+    whole = _digest(rows, key="id")
+    merged = _digest(rows[:200], key="id")
+    merged.merge(_digest(rows[200:], key="id"))
+    assert merged.to_dict() == whole.to_dict()
+    restored = TableDigest.from_dict(json.loads(whole.to_json()))
+    assert restored.to_dict() == whole.to_dict()
+    assert diff_digests(whole, restored)["match"]
+
+
+def test_key_bounds_split_the_sampled_keys():
+    bounds = _digest([{"id": i * 1000} for i in range(10_000)]).key_bounds()
+    assert len(bounds) == PARTITIONS - 1
+    assert bounds == sorted(bounds)
+    assert 0 < bounds[0] and bounds[-1] < 10_000_000
+    assert _digest([{"id": 1}, {"id": "a"}]).key_bounds() == []
+
+
+def test_unsupported_manifest_version_is_rejected():
+    manifest = _digest([{"id": 1}]).to_dict()
+    manifest["version"] = MANIFEST_VERSION + 1
+    with pytest.raises(ValueError, match="Unsupported"):
+        TableDigest.from_dict(manifest)
+
+
+def test_diff_reports_the_buckets_of_changed_rows():
+    source = [{"id": i, "v": i} for i in range(100)]
+    target = [dict(row) for row in source if row["id"] != 42]
+    target[7]["v"] = "changed"
+    report = _verify(source, target)
+    changed = {bucket for i in (7, 42) for bucket in _digest([source[i]]).buckets}
+    assert {b["bucket"] for b in report["mismatched_buckets"]} == changed
+    assert report["row_count"] == (100, 99)
+    assert report["mismatched_columns"] == ["id", "v"]
@@ -0,0 +1,85 @@
+import io
+import json
+import textwrap
+
+import pytest
+
+from app.utils.converters import (
+    iter_upserted,
+    json_array_items,
+    write_json_array,
+    write_sql_inserts,
+    write_sql_script,
+)
+
+
+def test_merge_inserts_are_batched_upserts():
+    docs = [{"id": i, "name": f"n'{i}", "score": None} for i in range(5)]
+    out = io.StringIO()
+    write_sql_inserts("t", ["id", "name", "score"], docs, out, "id", batch_size=2)
+    statements = out.getvalue().split(";\n")[:-1]
+    assert len(statements) == 3
+    assert statements[0] == (
+        "INSERT INTO `t` (`id`, `name`, `score`) VALUES\n"
+        "(0, 'n''0', NULL),\n"
+        "(1, 'n''1', NULL)\n"
+        "ON DUPLICATE KEY UPDATE `name` = VALUES(`name`), `score` = VALUES(`score`)"
+    )
+    assert statements[2].splitlines()[1] == "(4, 'n''4', NULL)"
+
+
+def test_key_only_tables_still_upsert():
+    out = io.StringIO()
+    write_sql_inserts("t", ["id"], [{"id": 1}], out, "id")
+    assert out.getvalue().endswith("ON DUPLICATE KEY UPDATE `id` = `id`;\n")
+
+
+def test_merge_script_declares_the_primary_key():
+    out = io.StringIO()
+    write_sql_script("t", [{"id": 1, "x": 2.5}], out, "id")
+    create = out.getvalue().split(";")[0]
+    assert create.startswith("CREATE TABLE IF NOT EXISTS `t`")
+    assert "PRIMARY KEY (`id`)" in create
+    with pytest.raises(ValueError, match="not a column"):
+        write_sql_script("t", [{"x": 1}], io.StringIO(), "id")
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_json_array_matches_indented_dump(batch_size):
+    docs = [{"a": [1, {"b": "x\ny"}], "c": {}}, [], 3, "s", {}]
+    out = io.StringIO()
+    write_json_array(docs, out, batch_size)
+    assert out.getvalue() == json.dumps(docs, indent=2)
+    per_doc = ",\n".join(textwrap.indent(json.dumps(d, indent=2), "  ") for d in docs)
+    assert json_array_items(docs) == per_doc
+    assert json_array_items([]) == ""
+
+
+def test_empty_json_array():
+    out = io.StringIO()
+    write_json_array([], out)
+    assert out.getvalue() == "[]"
+
+
+def test_upserts_replace_documents_by_key():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.t
+    collection.insert_one({"id": 1, "v": "old", "stale": True})
+    docs = [{"id": i, "v": f"new {i}"} for i in range(1, 6)]
+    assert list(iter_upserted(collection, iter(docs), "id", batch_size=2)) == docs
+    assert collection.count_documents({}) == 5
+    assert collection.find_one({"id": 1}, {"_id": 0}) == {"id": 1, "v": "new 1"}
+
+
+def test_upserts_can_update_fields_in_place():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.t
+    collection.insert_one({"id": 1, "v": "old", "kept": True})
+    list(iter_upserted(collection, [{"id": 1, "v": "new"}], "id", replace=False))
+    assert collection.find_one({"id": 1}, {"_id": 0}) == {
+        "id": 1,
+        "v": "new",
+        "kept": True,
+    }
+    with pytest.raises(ValueError, match="missing merge key"):
+        list(iter_upserted(collection, [{"v": 1}], "id"))
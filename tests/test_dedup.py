@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from app.utils.dedup import SpillingKeyMap, dedupe_by_key, merge_key_value
+
+
+@pytest.mark.parametrize("memory_limit", [2, 1000])
+def test_key_map_returns_replaced_values(memory_limit):
+    keys = SpillingKeyMap(memory_limit)
+    try:
+        for i in range(20):
+            assert keys.put(i % 7, i) == (i - 7 if i >= 7 else None)
+        assert keys.get(3) == 17
+        assert keys.get(99) is None
+        assert keys.put("3", 0) is None
+    finally:
+        keys.close()
+
+
+def test_key_map_spills_to_disk_and_cleans_up():
+    keys = SpillingKeyMap(memory_limit=3)
+    for i in range(10):
+        keys.put({"id": i}, i)
+    path = keys._path
+    assert path is not None and os.path.exists(path)
+    assert len(keys._memory) < 3
+    assert keys.put({"id": 0}, 100) == 0
+    assert keys.get({"id": 0}) == 100
+    keys.close()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("memory_limit", [1, 3, 1000])
+def test_last_record_per_key_wins_in_stream_order(memory_limit):
+    records = [
+        {"id": 1, "v": "a"},
+        {"id": 2, "v": "b"},
+        {"id": 1, "v": "c"},
+        {"id": 3, "v": "d"},
+        {"id": 2, "v": "e"},
+    ]
+    assert list(dedupe_by_key(records, "id", memory_limit)) == [
+        {"id": 1, "v": "c"},
+        {"id": 3, "v": "d"},
+        {"id": 2, "v": "e"},
+    ]
+
+
+def test_unique_records_pass_through_unchanged():
+    records = [{"id": f"k{i}", "n": i / 3} for i in range(100)]
+    assert list(dedupe_by_key(records, "id", memory_limit=10)) == records
+
+
+@pytest.mark.parametrize(
+    "record", [{"v": 1}, {"id": None}, ["id", 1], "id", None], ids=repr
+)
+def test_records_without_a_merge_key_are_rejected(record):
+    with pytest.raises(ValueError, match="missing merge key 'id'"):
+        merge_key_value(record, "id")
+    with pytest.raises(ValueError, match="missing merge key 'id'"):
+        list(dedupe_by_key([{"id": 1}, record], "id"))
+
+
+def test_falsy_keys_are_accepted():
+    assert merge_key_value({"id": 0}, "id") == 0
+    assert merge_key_value({"id": ""}, "id") == ""
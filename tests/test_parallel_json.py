@@ -0,0 +1,121 @@
+import io
+import json
+
+import pytest
+
+from app.utils import parallel_json
+from app.utils.parallel_json import (
+    ShardBoundaryError,
+    Shard,
+    convert_json_files_to_json,
+    convert_json_files_to_sql,
+    parse_shard,
+    plan_shards,
+)
+
+TRICKY_STRINGS = [
+    "close ] bracket",
+    "close } brace",
+    'quote " inside',
+    "back\\slash",
+    "trailing backslash \\",
+    '}, {"fake": [1]}, {',
+    '\\"], ["',
+]
+
+
+def _records(count: int) -> list:
+    return [
+        {
+            "id": i,
+            "text": TRICKY_STRINGS[i % len(TRICKY_STRINGS)],
+            "nested": {"items": [{"s": TRICKY_STRINGS[(i + 1) % len(TRICKY_STRINGS)]}]},
+        }
+        for i in range(count)
+    ]
+
+
+def _write(tmp_path, data, indent=None, name="data.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(data, indent=indent))
+    return path
+
+
+def _convert_json(path, shard_bytes, **kwargs) -> list:
+    out = io.StringIO()
+    convert_json_files_to_json(
+        [path], out, "data", workers=1, shard_bytes=shard_bytes, **kwargs
+    )
+    return json.loads(out.getvalue())
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("shard_bytes", [1, 17, 300])
+def test_tricky_strings_survive_sharding(tmp_path, indent, shard_bytes):
+    data = _records(60)
+    path = _write(tmp_path, data, indent)
+    assert len(plan_shards(path, shard_bytes)) > 1
+    assert _convert_json(path, shard_bytes) == data
+
+
+def test_scalar_elements_are_kept_between_cuts(tmp_path):
+    data = [1, "a]", {"x": "}"}, [2, "]"], None, 2.5, {"y": [3]}, "\\", True]
+    for indent in (None, 2):
+        path = _write(tmp_path, data, indent)
+        assert _convert_json(path, 1) == data
+
+
+def test_exact_scan_leaves_empty_final_shard(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_bytes(b'[{"a": 1}, {"b": "]"}\n]\n')
+    mm = path.read_bytes()
+    ranges = parallel_json._scan_array_shards(mm, mm.index(b"[") + 1, 1)
+    assert mm[ranges[-1][0] : ranges[-1][1]].strip() == b""
+    shards = [Shard(str(path), "array", start, end) for start, end in ranges]
+    assert [r for shard in shards for r in parse_shard(shard)] == [
+        {"a": 1},
+        {"b": "]"},
+    ]
+
+
+def test_wrong_guess_raises_boundary_error(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_bytes(b'[{"a": [{"b": 1}, {"c": 2}]}, {"d": 3}]')
+    # Cut right after {"b": 1}, inside the first element.
+    cut = path.read_bytes().index(b"}") + 1
+    with pytest.raises(ShardBoundaryError):
+        parse_shard(Shard(str(path), "array", 1, cut, exact=False))
+    with pytest.raises(json.JSONDecodeError):
+        parse_shard(Shard(str(path), "array", 1, cut))
+
+
+def test_wrong_guesses_are_replanned(tmp_path, monkeypatch):
+    data = [{"id": i, "orders": [{"n": 1}, {"n": 2}, {"n": 3}]} for i in range(20)]
+    path = _write(tmp_path, data)
+    source = path.read_bytes()
+
+    def bad_guess(mm, target, end):
+        # Always cut after the first nested order, which splits an element.
+        cut = source.index(b'{"n": 1}', target) + len(b'{"n": 1}')
+        return (cut, cut + 2) if cut < end else None
+
+    monkeypatch.setattr(parallel_json, "_guess_cut", bad_guess)
+    assert _convert_json(path, 40) == data
+    assert _convert_json(path, 40, merge_key="id") == data
+
+
+def test_sharded_sql_matches_unsharded(tmp_path):
+    data = [{"id": i, "text": TRICKY_STRINGS[i % 7], "score": i / 3} for i in range(50)]
+    path = _write(tmp_path, data, indent=2)
+    creates, digests = [], []
+    for shard_bytes in (1, 10**9):
+        out = io.StringIO()
+        (digest,) = convert_json_files_to_sql(
+            [path], out, "id", workers=1, shard_bytes=shard_bytes
+        )
+        creates.append(out.getvalue().split(";")[0])
+        digests.append(digest.to_dict())
+    assert creates[0] == creates[1]
+    assert "`score` DOUBLE" in creates[0]
+    assert digests[0] == digests[1]
+    assert digests[0]["row_count"] == 50
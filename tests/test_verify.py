@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from app.utils import verify
+from app.utils.checksums import TableDigest, manifest_json
+
+ROWS = [{"id": i * 7919, "name": f"row {i}", "tags": ["a", i]} for i in range(2000)]
+
+
+def _manifest(rows=ROWS, table="t") -> dict:
+    digest = TableDigest(table, "id")
+    for row in rows:
+        digest.add(row)
+    return digest.to_dict()
+
+
+def _run(tmp_path, capsys, manifest, target_rows) -> tuple[int, dict]:
+    manifest_path = tmp_path / "t.checksums.json"
+    manifest_path.write_text(json.dumps(manifest))
+    target_path = tmp_path / "t.json"
+    target_path.write_text(json.dumps(target_rows))
+    code = verify.main([str(manifest_path), "json", "--file", str(target_path)])
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_cli_passes_a_matching_json_target(tmp_path, capsys):
+    target = [{**row, "_id": str(i)} for i, row in enumerate(reversed(ROWS))]
+    code, report = _run(tmp_path, capsys, _manifest(), target)
+    assert code == 0
+    assert report["match"] and report["table"] == "t"
+
+
+def test_cli_reports_a_corrupted_json_target(tmp_path, capsys):
+    target = [dict(row) for row in ROWS[1:]]
+    target[0]["name"] = "changed"
+    code, report = _run(tmp_path, capsys, _manifest(), target)
+    assert code == 1
+    assert report["row_count"] == [2000, 1999]
+    assert report["mismatched_columns"] == ["id", "name", "tags"]
+    assert 1 <= len(report["mismatched_buckets"]) <= 2
+
+
+def test_cli_rejects_unsupported_manifests(tmp_path, capsys):
+    manifest = {**_manifest(), "version": 99}
+    with pytest.raises(SystemExit):
+        _run(tmp_path, capsys, manifest, ROWS)
+    assert "Unsupported checksum manifest version" in capsys.readouterr().err
+
+
+def test_cli_checks_each_table_of_a_list_manifest(tmp_path, capsys):
+    digests = [TableDigest.from_dict(_manifest(table=t)) for t in ("a", "b")]
+    manifest_path = tmp_path / "m.json"
+    manifest_path.write_text(manifest_json(digests))
+    target_path = tmp_path / "t.json"
+    target_path.write_text(json.dumps(ROWS))
+    assert verify.main([str(manifest_path), "json", "--file", str(target_path)]) == 0
+    assert [r["table"] for r in json.loads(capsys.readouterr().out)] == ["a", "b"]
+
+
+def _mongo_target(rows):
+    mongomock = pytest.importorskip("mongomock")
+    target = verify.MongoTarget.__new__(verify.MongoTarget)
+    target.collection = mongomock.MongoClient().db.t
+    target.collection.insert_many([dict(row) for row in rows])
+    return target
+
+
+def test_unindexed_keys_are_scanned_once(monkeypatch):
+    target = _mongo_target(ROWS)
+    monkeypatch.setattr(target, "fetch_range", None)
+    assert not target.can_partition("id", _manifest()["key_bounds"])
+    report = verify.verify(_manifest(), target)
+    assert report["match"] and report["unscanned_rows"] == 0
+
+
+def test_indexed_keys_are_scanned_in_ranges():
+    target = _mongo_target(ROWS + [{"id": None, "name": "orphan"}])
+    target.collection.create_index("id")
+    manifest = _manifest()
+    assert target.can_partition("id", manifest["key_bounds"])
+    report = verify.verify(manifest, target, workers=4)
+    assert report["unscanned_rows"] == 1
+    assert not report["match"]
+    target.collection.delete_one({"id": None})
+    assert verify.verify(manifest, target, workers=4)["match"]